@@ -0,0 +1,81 @@
+from __future__ import print_function
+
+# Measure os_imagetool startup time for modes that do not use Glance.
+#
+# Each sample runs a fresh interpreter that imports the entry point and
+# runs main() copying a small local image file to another file. Fails if
+# heavy dependencies were imported or if the best sample exceeds --max-ms.
+#
+#   python benchmarks/startup.py --runs 10 --max-ms 300
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ['glanceclient', 'keystoneauth1', 'requests', 'dateutil']
+
+SNIPPET = """
+import json, sys, time
+start = time.time()
+from os_imagetool.cmd import imagetool
+sys.argv = ['os_imagetool', '--in-file', {in_file!r}, '--out-file', {out_file!r}]
+rc = imagetool.main()
+elapsed = time.time() - start
+heavy = sorted(set(m.split('.')[0] for m in sys.modules
+                   if m.split('.')[0] in {heavy!r}))
+print(json.dumps(dict(elapsed=elapsed, heavy=heavy, rc=rc)))
+"""
+
+
+def sample(in_file, out_file):
+    snippet = SNIPPET.format(
+        in_file=in_file, out_file=out_file, heavy=HEAVY_MODULES)
+    with open(os.devnull, 'w') as devnull:
+        out = subprocess.check_output(
+            [sys.executable, '-c', snippet], stderr=devnull)
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='os_imagetool startup time')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument(
+        '--max-ms',
+        type=float,
+        default=None,
+        help='fail if the best run is slower than this')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        in_file = os.path.join(tmpdir, 'in.img')
+        with open(in_file, 'wb') as f:
+            f.write(os.urandom(64 * 1024))
+        out_file = os.path.join(tmpdir, 'out.img')
+        results = [sample(in_file, out_file) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(tmpdir)
+    times = sorted(r['elapsed'] * 1000 for r in results)
+    print('startup: best {:.1f} ms, median {:.1f} ms over {} runs'.format(
+        times[0], times[len(times) // 2], len(times)))
+
+    if any(r['rc'] != 0 for r in results):
+        print('FAIL: in-file to out-file run failed')
+        return 1
+    heavy = sorted(set(m for r in results for m in r['heavy']))
+    if heavy:
+        print('FAIL: heavy modules imported: {}'.format(', '.join(heavy)))
+        return 1
+    if args.max_ms is not None and times[0] > args.max_ms:
+        print('FAIL: startup {:.1f} ms exceeds {:.1f} ms'.format(
+            times[0], args.max_ms))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,10 +8,10 @@ import os
 import sys
 import time
 
-import dateutil.parser as dp
 import six
 
 from os_imagetool.errors import ImageToolError
+from os_imagetool.fingerprint import image_fingerprint
 from os_imagetool.loader import DEFAULT_CHUNK_SIZE, Downloader, Reader
 
 LOG = logging.getLogger(__name__)
@@ -68,7 +68,22 @@ def download_image_to_glance(client,
                              min_ram=None,
                              properties=dict(),
                              force_upload=False,
-                             visibility='private'):
+                             visibility='private',
+                             use_import=False,
+                             import_timeout=3600,
+                             use_fingerprint=False):
+
+    # Fingerprint only helps when the checksum would have to be calculated
+    # by hashing the whole file, a known checksum is compared for free
+    fingerprint = None
+    if use_fingerprint and not force_upload and not image.checksum_known:
+        fingerprint = image_fingerprint(image)
+    if fingerprint is not None:
+        images = list(client.list(fingerprint=fingerprint))
+        if len(images) > 0:
+            LOG.info("Image with fingerprint {} already exists, skipping".
+                     format(fingerprint))
+            return None
 
     images = list(
         client.list(
@@ -76,6 +91,14 @@ def download_image_to_glance(client,
     if len(images) > 0 and not force_upload:
         LOG.info("Image with checksum {} already exists, skipping".format(
             image.checksum))
+        # Store the fingerprint so that the next run can skip hashing
+        if fingerprint is not None:
+            for existing in images:
+                LOG.info("Image: %s update %s: %s -> %s", existing.id,
+                         client.PROP_FINGERPRINT,
+                         existing.get(client.PROP_FINGERPRINT), fingerprint)
+                client.client.images.update(
+                    existing.id, **{client.PROP_FINGERPRINT: fingerprint})
         return None
 
     kwargs = properties
@@ -87,18 +110,33 @@ def download_image_to_glance(client,
         kwargs['_image_group'] = image_group
     if image.checksum is not None and image.checksum_type is not None:
         kwargs['_checksum_{}'.format(image.checksum_type)] = image.checksum
+    if fingerprint is not None:
+        kwargs[client.PROP_FINGERPRINT] = fingerprint
 
     cb = get_io_progress_cb(total_length=image.size)
-    loader = Downloader(callback=cb)
-    stream = loader.iter_download(image.location)
-    LOG.info('uploading to glance %s -> %s', image.location, name)
-    gimage = client.upload_image(
-        name,
-        stream,
-        disk_format=disk_format,
-        container_format=container_format,
-        **kwargs)
-    print(file=sys.stderr)
+    # Global rate is charged once, on the upload side
+    loader = Downloader(callback=cb, throttle_global=False)
+    gimage = None
+    if use_import:
+        gimage = import_image_to_glance(
+            client,
+            image,
+            name,
+            loader,
+            timeout=import_timeout,
+            disk_format=disk_format,
+            container_format=container_format,
+            **kwargs)
+    if gimage is None:
+        stream = loader.iter_download(image.location)
+        LOG.info('uploading to glance %s -> %s', image.location, name)
+        gimage = client.upload_image(
+            name,
+            stream,
+            disk_format=disk_format,
+            container_format=container_format,
+            **kwargs)
+        print(file=sys.stderr)
 
     try:
         if verify and image.checksum is not None:
@@ -121,6 +159,35 @@ def download_image_to_glance(client,
     return gimage.id
 
 
+def import_image_to_glance(client, image, name, loader, **kwargs):
+    # Remote images are fetched by Glance itself using web-download, local
+    # files are staged with glance-direct. Returns None if the import method
+    # is not available or the import failed so that the caller can fall back
+    # to upload.
+    try:
+        if image.location.startswith(('http://', 'https://')):
+            method = client.IMPORT_WEB_DOWNLOAD
+            LOG.info('importing to glance %s -> %s', image.location, name)
+            gimage = client.import_image(
+                name, method, uri=image.location, **kwargs)
+        else:
+            method = client.IMPORT_GLANCE_DIRECT
+            LOG.info('staging to glance %s -> %s', image.location, name)
+            stream = loader.iter_download(image.location)
+            gimage = client.import_image(
+                name, method, stream=stream, **kwargs)
+            if gimage is not None:
+                print(file=sys.stderr)
+    except ImageToolError as e:
+        LOG.error('glance import using %s failed, using upload: %s', method,
+                  e)
+        return None
+    if gimage is None:
+        LOG.info('glance import method %s not available, using upload',
+                 method)
+    return gimage
+
+
 def glance_rotate_images(client,
                          num,
                          image_group,
@@ -130,6 +197,8 @@ def glance_rotate_images(client,
                          delete=False,
                          hide=False,
                          visibility='private'):
+    import dateutil.parser as dp
+
     images = client.list(image_group=image_group)
     images = sorted(
         images, key=lambda x: dp.parse(x['created_at']), reverse=True)
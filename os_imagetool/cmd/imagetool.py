@@ -6,12 +6,9 @@ import os
 import sys
 import signal
 
-import keystoneauth1.loading as loading
-
 import os_imagetool.cli as cli
-from os_imagetool.discovery import ImageDiscoverer
+import os_imagetool.scheduler as scheduler
 from os_imagetool.errors import ImageToolError
-from os_imagetool.glance import GlanceClient
 from os_imagetool.image import Image
 from os_imagetool.log import set_debug, setup_logging
 
@@ -27,18 +24,91 @@ def sigterm(s, f):
 signal.signal(signal.SIGTERM, sigterm)
 
 
+# Heavy dependencies (glanceclient, keystoneauth1, requests, dateutil) are
+# imported only by the modes that need them to keep startup fast
+def needs_glance(args):
+    return bool(args.out_glance_name or args.glance_rotate_force)
+
+
+# Session options registered by keystoneauth1 that lack the --os- prefix
+KEYSTONE_SESSION_OPTIONS = ('--insecure', '--timeout', '--collect-timing')
+
+
+def has_keystone_options(argv):
+    for arg in argv:
+        opt = arg.split('=', 1)[0]
+        if opt.startswith('--os-') or opt in KEYSTONE_SESSION_OPTIONS:
+            return True
+    return False
+
+
+def get_glance_client(args):
+    from os_imagetool.glance import GlanceClient
+    return GlanceClient.from_argparse(args)
+
+
 def run_tool(args):
-    do_rotate = False
+    scheduler.configure(
+        max_rate=args.max_rate,
+        max_host_rate=args.max_host_rate)
+    # Only repository access uses the shared HTTP session (and requests)
+    if args.repo:
+        import os_imagetool.transport as transport
+        transport.configure(
+            pool_connections=args.http_pool_size,
+            pool_maxsize=args.http_pool_size,
+            retries=args.http_retries,
+            timeout=args.http_timeout)
 
+    if args.watch:
+        return run_watch(args)
+
+    image = None
     if args.in_file:
         LOG.info("opening image file: %s", args.in_file)
         image = Image.from_file(args.in_file)
     elif args.repo:
         LOG.info("discovering image from %s", args.repo)
+        from os_imagetool.discovery import ImageDiscoverer
         disc = ImageDiscoverer(args.repo)
         disc.refresh_repository(pattern=args.repo_match_pattern)
         image = disc.get_latest()
 
+    process_image(args, image)
+
+
+def run_watch(args):
+    from os_imagetool.daemon import StatusServer, Watcher
+    from os_imagetool.discovery import ImageDiscoverer
+
+    if not args.repo:
+        raise ImageToolError("watch mode requires a repo")
+    # Keystone session and thus the token is kept for the whole run
+    client = get_glance_client(args) if needs_glance(args) else None
+    disc = ImageDiscoverer(args.repo)
+    watcher = Watcher(
+        disc,
+        lambda image: process_image(args, image, client=client),
+        interval=args.watch_interval,
+        jitter=args.watch_jitter,
+        pattern=args.repo_match_pattern,
+        transfer_timeout=args.watch_transfer_timeout)
+    server = None
+    if args.watch_listen:
+        host, port = args.watch_listen
+        server = StatusServer(watcher, host=host, port=port)
+        server.start()
+    LOG.info("watching %s every %s seconds", args.repo, args.watch_interval)
+    try:
+        watcher.run()
+    finally:
+        if server is not None:
+            server.stop()
+
+
+def process_image(args, image, client=None):
+    do_rotate = False
+
     if args.out_file:
         if not image:
             raise ImageToolError("no in-image from repo or from file")
@@ -52,7 +122,7 @@ def run_tool(args):
         if not image:
             raise ImageToolError("no in-image from repo or from file")
         LOG.info("in-image: %s", image)
-        client = GlanceClient.from_argparse(args)
+        client = client or get_glance_client(args)
         imgid = cli.download_image_to_glance(
             client,
             image,
@@ -65,7 +135,10 @@ def run_tool(args):
             min_ram=args.out_glance_min_ram,
             properties=dict(args.out_glance_properties or []),
             force_upload=args.out_glance_force,
-            visibility=args.out_glance_visibility)
+            visibility=args.out_glance_visibility,
+            use_import=args.out_glance_import,
+            import_timeout=args.out_glance_import_timeout,
+            use_fingerprint=args.out_glance_fingerprint)
         do_rotate = (imgid is not None and args.glance_rotate is not None)
 
     if do_rotate or args.glance_rotate_force:
@@ -73,7 +146,7 @@ def run_tool(args):
             raise ImageToolError("invalid value for glance_rotate")
         if not args.glance_image_group:
             raise ImageToolError("image group is required")
-        client = GlanceClient.from_argparse(args)
+        client = client or get_glance_client(args)
         cli.glance_rotate_images(
             client,
             args.glance_rotate,
@@ -86,10 +159,11 @@ def run_tool(args):
             visibility=args.glance_rotate_visibility)
 
 
-def main():
-    setup_logging()
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
     parser = argparse.ArgumentParser(
-        description='Tool to handle image downloads and uploads')
+        description='Tool to handle image downloads and uploads',
+        add_help=False)
     parser.add_argument(
         '--in-file',
         default=os.environ.get('IMAGETOOL_IN_FILE'),
@@ -157,6 +231,24 @@ def main():
         metavar='name',
         default=os.environ.get('IMAGETOOL_OUT_GLANCE_VISIBILITY', 'private'),
         help='Set uploaded image visibility to this value')
+    parser.add_argument(
+        '--out-glance-import',
+        action='store_true',
+        default=parse_bool(os.environ.get('IMAGETOOL_OUT_GLANCE_IMPORT')),
+        help='Use Glance image import (web-download or glance-direct) ' +
+             'instead of upload when available')
+    parser.add_argument(
+        '--out-glance-import-timeout',
+        metavar='SECONDS',
+        type=float,
+        default=float(os.environ.get('IMAGETOOL_OUT_GLANCE_IMPORT_TIMEOUT', 3600)),
+        help='Give up on a Glance image import after SECONDS and use upload')
+    parser.add_argument(
+        '--out-glance-fingerprint',
+        action='store_true',
+        default=parse_bool(os.environ.get('IMAGETOOL_OUT_GLANCE_FINGERPRINT')),
+        help='Skip upload early if an image with the same size, ETag and ' +
+             'sampled content fingerprint already exists in Glance')
     parser.add_argument(
         '--glance-image-group',
         metavar='NAME',
@@ -208,11 +300,84 @@ def main():
         action='store_true',
         default=parse_bool(os.environ.get('IMAGETOOL_VERIFY')),
         help='Verify uploaded or downloaded image')
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        default=parse_bool(os.environ.get('IMAGETOOL_WATCH')),
+        help='Keep running and poll the repo, transfer when the latest image changes')
+    parser.add_argument(
+        '--watch-interval',
+        metavar='SECONDS',
+        type=float,
+        default=float(os.environ.get('IMAGETOOL_WATCH_INTERVAL', 300)),
+        help='Seconds between repo polls in watch mode')
+    parser.add_argument(
+        '--watch-jitter',
+        metavar='SECONDS',
+        type=float,
+        default=float(os.environ.get('IMAGETOOL_WATCH_JITTER', 30)),
+        help='Add random delay up to SECONDS to each poll interval')
+    parser.add_argument(
+        '--watch-transfer-timeout',
+        metavar='SECONDS',
+        type=float,
+        default=float(os.environ.get('IMAGETOOL_WATCH_TRANSFER_TIMEOUT', 4 * 3600)),
+        help='Report unhealthy when a transfer runs longer than SECONDS')
+    parser.add_argument(
+        '--watch-listen',
+        metavar='[HOST:]PORT',
+        type=parse_address,
+        default=parse_address(os.environ.get('IMAGETOOL_WATCH_LISTEN')),
+        help='Serve /health and /metrics on this address in watch mode')
+    parser.add_argument(
+        '--max-rate',
+        metavar='BYTES',
+        type=parse_size,
+        default=parse_size(os.environ.get('IMAGETOOL_MAX_RATE')),
+        help='Limit total transfer rate to BYTES per second (K, M, G suffixes allowed)')
+    parser.add_argument(
+        '--max-host-rate',
+        metavar='BYTES',
+        type=parse_size,
+        default=parse_size(os.environ.get('IMAGETOOL_MAX_HOST_RATE')),
+        help='Limit transfer rate per remote host to BYTES per second')
+    parser.add_argument(
+        '--http-timeout',
+        metavar='SECONDS',
+        type=float,
+        default=(lambda x=os.environ.get('IMAGETOOL_HTTP_TIMEOUT'): float(x) if x else None)(),
+        help='Timeout for connecting and reading from image repositories')
+    parser.add_argument(
+        '--http-retries',
+        metavar='NUM',
+        type=int,
+        default=(lambda x=os.environ.get('IMAGETOOL_HTTP_RETRIES'): int(x) if x else None)(),
+        help='Number of retries for failed image repository requests')
+    parser.add_argument(
+        '--http-pool-size',
+        metavar='NUM',
+        type=int,
+        default=(lambda x=os.environ.get('IMAGETOOL_HTTP_POOL_SIZE'): int(x) if x else None)(),
+        help='Number of pooled keep-alive connections per host')
+
+    # Keystone options are expensive to register, only do it when Glance
+    # is going to be used, keystone options are given (shared job
+    # definitions pass them to every mode) or the full help is requested
+    args, _ = parser.parse_known_args(argv)
+    if (needs_glance(args) or has_keystone_options(argv) or '-h' in argv or
+            '--help' in argv):
+        import keystoneauth1.loading as loading
+        loading.register_auth_argparse_arguments(parser, argv)
+        loading.session.register_argparse_arguments(parser)
+    parser.add_argument(
+        '-h', '--help', action='help', help='show this help message and exit')
+
+    return parser.parse_args(argv)
 
-    loading.register_auth_argparse_arguments(parser, sys.argv)
-    loading.session.register_argparse_arguments(parser)
 
-    args = parser.parse_args()
+def main():
+    setup_logging()
+    args = parse_args()
 
     try:
         # Parse ['key1=val', 'key2=val,key3=val']
@@ -241,6 +406,30 @@ def parse_list(val):
     else:
         return []
 
+def parse_size(val):
+    if not val:
+        return None
+    units = dict(k=1024, m=1024 ** 2, g=1024 ** 3)
+    mult = units.get(val[-1].lower())
+    try:
+        if mult:
+            return int(float(val[:-1]) * mult)
+        return int(val)
+    except ValueError:
+        raise argparse.ArgumentTypeError('cannot parse size {}'.format(val))
+
+def parse_address(val):
+    if not val:
+        return None
+    host, _, port = val.rpartition(':')
+    try:
+        port = int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError('cannot parse address {}'.format(val))
+    if not 0 < port < 65536:
+        raise argparse.ArgumentTypeError('invalid port in {}'.format(val))
+    return (host or '127.0.0.1', port)
+
 def parse_kvs(val):
     p = val.split('=')
     if len(p) == 2:
@@ -0,0 +1,171 @@
+from __future__ import print_function, unicode_literals
+
+import json
+import logging
+import random
+import threading
+import time
+
+from six.moves import BaseHTTPServer
+
+LOG = logging.getLogger(__name__)
+
+
+class Watcher(object):
+    # Polls the repository and calls handler(image) whenever the latest
+    # image changes. A failed handler is retried on the next poll.
+    def __init__(self,
+                 discoverer,
+                 handler,
+                 interval=300,
+                 jitter=0,
+                 pattern=None,
+                 transfer_timeout=4 * 3600,
+                 max_transfer_errors=3):
+        self.discoverer = discoverer
+        self.handler = handler
+        self.interval = interval
+        self.jitter = jitter
+        self.pattern = pattern
+        self.transfer_timeout = transfer_timeout
+        self.max_transfer_errors = max_transfer_errors
+        self.current = None
+        self.transfer_started = None
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.metrics = dict(
+            polls_total=0,
+            poll_errors_total=0,
+            transfers_total=0,
+            transfer_errors_total=0,
+            consecutive_transfer_errors=0,
+            last_poll_timestamp=0,
+            last_poll_success_timestamp=0,
+            last_transfer_success_timestamp=0)
+
+    def _inc(self, key, value=1):
+        with self.lock:
+            self.metrics[key] += value
+
+    def _set(self, key, value):
+        with self.lock:
+            self.metrics[key] = value
+
+    def get_metrics(self):
+        with self.lock:
+            return dict(self.metrics)
+
+    def healthy(self):
+        now = time.time()
+        # A long running transfer blocks polling but is not a failure
+        # unless it runs past the transfer timeout
+        started = self.transfer_started
+        if started is not None:
+            return now - started < self.transfer_timeout
+        metrics = self.get_metrics()
+        if metrics['consecutive_transfer_errors'] >= self.max_transfer_errors:
+            return False
+        last = max(metrics['last_poll_success_timestamp'],
+                   metrics['last_transfer_success_timestamp'])
+        return now - last < 3 * (self.interval + self.jitter)
+
+    def poll(self):
+        self._inc('polls_total')
+        self._set('last_poll_timestamp', time.time())
+        try:
+            self.discoverer.refresh_repository(
+                pattern=self.pattern, incremental=True)
+        except Exception as e:
+            self._inc('poll_errors_total')
+            LOG.error('polling %s failed: %s',
+                      self.discoverer.repository_url, e)
+            return
+        self._set('last_poll_success_timestamp', time.time())
+
+        image = self.discoverer.get_latest()
+        if image is None:
+            return
+        key = (image.name, image.checksum)
+        if key == self.current:
+            LOG.debug('latest image unchanged: %s', image.name)
+            return
+
+        LOG.info('latest image changed: %s', image)
+        self._inc('transfers_total')
+        self.transfer_started = time.time()
+        try:
+            self.handler(image)
+        except Exception as e:
+            self._inc('transfer_errors_total')
+            self._inc('consecutive_transfer_errors')
+            LOG.error('handling image %s failed: %s', image.name, e)
+            return
+        finally:
+            self.transfer_started = None
+        self._set('consecutive_transfer_errors', 0)
+        self._set('last_transfer_success_timestamp', time.time())
+        self.current = key
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.poll()
+            delay = self.interval + random.uniform(0, self.jitter)
+            LOG.debug('next poll in %.1f seconds', delay)
+            self.stopped.wait(delay)
+
+    def stop(self):
+        self.stopped.set()
+
+
+class StatusHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        watcher = self.server.watcher
+        if self.path == '/health':
+            ok = watcher.healthy()
+            self.reply(200 if ok else 503, 'application/json',
+                       json.dumps(dict(healthy=ok)))
+        elif self.path == '/metrics':
+            self.reply(200, 'text/plain; version=0.0.4',
+                       format_metrics(watcher))
+        else:
+            self.reply(404, 'text/plain', 'not found\n')
+
+    def reply(self, code, content_type, body):
+        body = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        LOG.debug('%s %s', self.address_string(), fmt % args)
+
+
+def format_metrics(watcher):
+    # Prometheus text format
+    lines = []
+    for k, v in sorted(watcher.get_metrics().items()):
+        lines.append('os_imagetool_{} {}'.format(k, v))
+    lines.append('os_imagetool_healthy {}'.format(int(watcher.healthy())))
+    lines.append('os_imagetool_transfer_in_progress {}'.format(
+        int(watcher.transfer_started is not None)))
+    return '\n'.join(lines) + '\n'
+
+
+class StatusServer(object):
+    # Serves /health and /metrics for a Watcher in a background thread
+    def __init__(self, watcher, host='127.0.0.1', port=8080):
+        self.server = BaseHTTPServer.HTTPServer((host, port), StatusHandler)
+        self.server.watcher = watcher
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    def start(self):
+        LOG.info('status server listening on %s:%s',
+                 *self.server.server_address[:2])
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
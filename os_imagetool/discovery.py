@@ -7,21 +7,44 @@ import rfc822
 import urlparse
 from collections import namedtuple
 
-import requests
-
+from os_imagetool.errors import ImageToolError
 from os_imagetool.image import Image
+from os_imagetool.transport import get_session, http_errors
 
 LOG = logging.getLogger(__name__)
 
 
 class ImageDiscoverer(object):
-    def __init__(self, repository_url, basepath=None):
+    def __init__(self, repository_url, basepath=None, session=None):
         self.repository_url = repository_url
         self.repository = {}
         self.basepath = basepath
+        self.session = session
+        self.index_etag = None
+        self.index_last_modified = None
+
+    def get_session(self):
+        return self.session or get_session()
 
-    def refresh_repository(self, pattern=None):
-        r = requests.get(self.repository_url)
+    def refresh_repository(self, pattern=None, incremental=False):
+        # In incremental mode the index is fetched conditionally and images
+        # whose checksum did not change are not rediscovered. Returns False
+        # if the index was not modified.
+        headers = {}
+        if incremental and self.index_etag:
+            headers['If-None-Match'] = self.index_etag
+        if incremental and self.index_last_modified:
+            headers['If-Modified-Since'] = self.index_last_modified
+        with http_errors():
+            r = self.get_session().get(self.repository_url, headers=headers)
+        if r.status_code == 304:
+            LOG.debug('repository index %s not modified',
+                      self.repository_url)
+            return False
+        if not r.ok:
+            raise ImageToolError("non-ok response: {}".format(r))
+        previous = self.repository if incremental else {}
+        repository = {}
         for line in r.iter_lines():
             parts = re.split(r' +', line)
             chksum = parts[0]
@@ -31,26 +54,35 @@ class ImageDiscoverer(object):
             if image_name.startswith('*'):
                 image_name = image_name[1:]
             basepath = self.basepath if self.basepath else self.repository_url
+            known = previous.get(image_name)
+            if (known is not None and known.checksum == chksum.lower() and
+                    known.size is not None and
+                    known.last_modified is not None):
+                repository[image_name] = known
+                continue
             image = Image(
                 name=image_name,
                 size=None,
                 last_modified=None,
                 location=urlparse.urljoin(basepath, image_name),
                 checksum=chksum)
-            self.repository[image_name] = self.discover_image(image)
+            repository[image_name] = self.discover_image(image)
+        self.repository = repository
+        self.index_etag = r.headers.get('ETag')
+        self.index_last_modified = r.headers.get('Last-Modified')
+        return True
 
     def discover_image(self, image):
-        sess = requests.Session()
-        resp = sess.head(image.location)
-        if resp.is_redirect:
-            final_resp = None
-            for final_resp in sess.resolve_redirects(resp, resp.request):
-                pass
-            resp = final_resp
+        with http_errors():
+            resp = self.get_session().head(
+                image.location, allow_redirects=True)
+        if not resp.ok:
+            raise ImageToolError("non-ok response: {}".format(resp))
         lastmodified = resp.headers.get('Last-Modified')
         if lastmodified:
             image.last_modified = datetime.datetime.fromtimestamp(
                 rfc822.mktime_tz(rfc822.parsedate_tz(lastmodified)))
+        image.etag = resp.headers.get('ETag')
         size = resp.headers.get('Content-Length')
         if size:
             image.size = size
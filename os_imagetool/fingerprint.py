@@ -0,0 +1,93 @@
+from __future__ import print_function, unicode_literals
+
+import hashlib
+import logging
+from urlparse import urlparse
+
+LOG = logging.getLogger(__name__)
+
+VERSION = 'v1'
+SAMPLE_SIZE = 64 * 1024
+# Number of evenly strided samples taken in addition to the tail
+SAMPLE_COUNT = 8
+
+
+# Fingerprint is a cheap identity of the image built from the size,
+# the ETag/Last-Modified validator and a hash over sampled blocks
+# (head, strided and tail). It is meant to detect unchanged images
+# quickly, not to replace checksum verification.
+def sample_ranges(size, sample_size=SAMPLE_SIZE, count=SAMPLE_COUNT):
+    if size <= sample_size * (count + 1):
+        return [(0, size)]
+    stride = (size - sample_size) // count
+    ranges = [(i * stride, sample_size) for i in range(count)]
+    ranges.append((size - sample_size, sample_size))
+    return ranges
+
+
+def _format(size, validator, samples):
+    hasher = hashlib.sha256()
+    hasher.update(validator.encode('utf-8'))
+    for data in samples:
+        hasher.update(data)
+    return '{}:{}:{}'.format(VERSION, size, hasher.hexdigest())
+
+
+def _read_file_samples(path, ranges):
+    with open(path, 'rb') as f:
+        for offset, length in ranges:
+            f.seek(offset)
+            yield f.read(length)
+
+
+def _read_http_samples(url, ranges, session):
+    for offset, length in ranges:
+        # Stream so that a server ignoring Range does not send the whole
+        # image before we notice
+        resp = session.get(
+            url,
+            stream=True,
+            headers={'Range': 'bytes={}-{}'.format(offset,
+                                                   offset + length - 1)})
+        try:
+            if resp.status_code != 206:
+                raise ValueError('range request not honored')
+            data = resp.raw.read(length, decode_content=True)
+        finally:
+            resp.close()
+        if len(data) != length:
+            raise ValueError('short range response')
+        yield data
+
+
+def image_fingerprint(image, session=None):
+    if image.size is None:
+        return None
+    size = int(image.size)
+    if image.etag:
+        validator = image.etag
+    elif image.last_modified:
+        validator = image.last_modified.isoformat()
+    else:
+        # Samples alone would miss changes outside the sampled blocks
+        LOG.info('cannot fingerprint %s: no ETag or Last-Modified',
+                 image.location)
+        return None
+    ranges = sample_ranges(size)
+    parsed = urlparse(image.location)
+    try:
+        if parsed.scheme == 'file':
+            samples = list(_read_file_samples(parsed.path, ranges))
+        elif parsed.scheme in ('http', 'https'):
+            from os_imagetool.transport import get_session
+            samples = list(
+                _read_http_samples(image.location, ranges, session or
+                                   get_session()))
+        else:
+            return None
+    except (IOError, ValueError) as e:
+        LOG.info('cannot fingerprint %s: %s', image.location, e)
+        return None
+    fingerprint = _format(size, validator, samples)
+    LOG.debug('fingerprint for %s: %s', image.location, fingerprint)
+    return fingerprint
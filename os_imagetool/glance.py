@@ -2,8 +2,10 @@ from __future__ import print_function, unicode_literals
 
 import logging
 import sys
+import time
 
 import glanceclient.common.http as glance_http
+import glanceclient.exc as glance_exc
 import keystoneauth1.loading as ksloading
 import six
 from glanceclient.v2.client import Client
@@ -11,9 +13,12 @@ from keystoneauth1.session import Session
 
 from os_imagetool.errors import ImageToolError
 from os_imagetool.loader import DEFAULT_CHUNK_SIZE
+from os_imagetool.scheduler import get_scheduler
 
 LOG = logging.getLogger(__name__)
 
+DEFAULT_IMPORT_TIMEOUT = 3600
+
 # Override glance chunk size with our default for performance
 # Too bad they don't expose this
 glance_http.CHUNKSIZE = DEFAULT_CHUNK_SIZE
@@ -35,6 +40,10 @@ class GlanceClient(object):
     PROP_ROTATED = '_rotated'
     PROP_ORIGINAL_NAME = '_orig_name'
     PROP_IS_LATEST = '_is_latest'
+    PROP_FINGERPRINT = '_fingerprint'
+
+    IMPORT_WEB_DOWNLOAD = 'web-download'
+    IMPORT_GLANCE_DIRECT = 'glance-direct'
 
     @classmethod
     def from_argparse(cls, args):
@@ -42,13 +51,19 @@ class GlanceClient(object):
         session = Session(auth=auth)
         return cls(session)
 
-    def __init__(self, session):
+    def __init__(self, session, scheduler=None):
+        self.session = session
         self.client = Client(session=session)
+        self.scheduler = scheduler
+
+    def get_endpoint(self):
+        return self.session.get_endpoint(service_type='image')
 
     def list(self,
              checksum=None,
              checksum_type=None,
              image_group=None,
+             fingerprint=None,
              **qfilter):
         images = self.client.images.list(filters=qfilter)
 
@@ -62,10 +77,16 @@ class GlanceClient(object):
             k = self.PROP_CHECKSUM.format(checksum_type)
             images = (x for x in images if x.get(k) == checksum)
 
+        if fingerprint:
+            images = (x for x in images
+                      if x.get(self.PROP_FINGERPRINT) == fingerprint)
+
         return images
 
     def upload_image(self, image_name, stream, **kwargs):
         kwargs[self.PROP_ORIGINAL_NAME] = image_name
+        scheduler = self.scheduler or get_scheduler()
+        stream = scheduler.iter_throttle(self.get_endpoint(), stream)
         image = self.client.images.create(name=image_name, **kwargs)
         LOG.info('created image: {}'.format(image.id))
         try:
@@ -75,3 +96,78 @@ class GlanceClient(object):
             LOG.error('cleanup image: {}'.format(image.id))
             six.reraise(*sys.exc_info())
         return image
+
+    def get_import_methods(self):
+        try:
+            info = self.client.images.get_import_info()
+        except glance_exc.HTTPException as e:
+            LOG.debug('image import discovery failed: %s', e)
+            return []
+        return info.get('import-methods', {}).get('value', [])
+
+    def import_image(self, image_name, method, uri=None, stream=None,
+                     timeout=DEFAULT_IMPORT_TIMEOUT, **kwargs):
+        if method not in self.get_import_methods():
+            return None
+        kwargs[self.PROP_ORIGINAL_NAME] = image_name
+        if stream is not None:
+            scheduler = self.scheduler or get_scheduler()
+            stream = scheduler.iter_throttle(self.get_endpoint(), stream)
+        image = self.client.images.create(name=image_name, **kwargs)
+        LOG.info('created image: {}'.format(image.id))
+        try:
+            if method == self.IMPORT_GLANCE_DIRECT:
+                self.client.images.stage(image.id, GlanceChunkAdapter(stream))
+            LOG.info('importing image %s using %s', image.id, method)
+            self.client.images.image_import(image.id, method=method, uri=uri)
+            image = self.wait_for_import(image.id, timeout=timeout)
+        except:
+            exc_info = sys.exc_info()
+            self.client.images.delete(image.id)
+            LOG.error('cleanup image: {}'.format(image.id))
+            if isinstance(exc_info[1], glance_exc.HTTPException):
+                raise ImageToolError('image import failed: {}'.format(
+                    exc_info[1]))
+            six.reraise(*exc_info)
+        return image
+
+    def _import_failure(self, image):
+        if image.get('os_glance_failed_import'):
+            return 'failed to import to stores {}'.format(
+                image['os_glance_failed_import'])
+        if image.status in ('killed', 'deleted', 'deactivated'):
+            return image.status
+        # Tasks API is not available on older clouds and clients
+        try:
+            tasks = self.client.images.get_associated_image_tasks(image.id)
+        except (AttributeError, glance_exc.HTTPException):
+            return None
+        for task in tasks.get('tasks', []):
+            if task.get('status') == 'failure':
+                return task.get('message') or 'task {} failed'.format(
+                    task.get('id'))
+        return None
+
+    def wait_for_import(self, image_id, timeout=DEFAULT_IMPORT_TIMEOUT,
+                        interval=5):
+        # Failed imports do not kill the image, Glance reverts it back to
+        # queued (web-download) or uploading (glance-direct)
+        deadline = time.time() + timeout
+        importing = False
+        while True:
+            image = self.client.images.get(image_id)
+            if image.status == 'active':
+                return image
+            failure = self._import_failure(image)
+            if failure is None and importing and image.status in (
+                    'queued', 'uploading'):
+                failure = 'image reverted to {}'.format(image.status)
+            if failure is not None:
+                raise ImageToolError('image {} import failed: {}'.format(
+                    image_id, failure))
+            importing = importing or image.status == 'importing'
+            if time.time() > deadline:
+                raise ImageToolError('image {} import timed out'.format(
+                    image_id))
+            LOG.debug('image %s status %s, waiting', image_id, image.status)
+            time.sleep(interval)
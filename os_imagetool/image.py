@@ -7,41 +7,57 @@ import hashlib
 from os_imagetool.loader import DEFAULT_CHUNK_SIZE
 
 class Image(object):
-    def __init__(self, name=None, checksum=None, checksum_type=None, location=None, size=None, last_modified=None):
+    def __init__(self, name=None, checksum=None, checksum_type=None, location=None, size=None, last_modified=None, etag=None):
         self.name = name
+        self._checksum = None
+        self._path = None
         if checksum:
             self.checksum = str(checksum)
         self._checksum_type = checksum_type
         self.location = location
         self.size = size
         self.last_modified = last_modified
+        self.etag = etag
 
     @classmethod
     def from_file(cls, path, checksum_type='sha256'):
-        hasher = getattr(hashlib, checksum_type)()
+        # Checksum is calculated on first access so that cheaper checks
+        # (fingerprints) can be done without reading the whole file
         stat = os.stat(path)
-        with open(path, 'r') as f:
-            image = cls(
-                name=os.path.basename(path),
-                size=stat.st_size,
-                location='file://{}'.format(os.path.abspath(path)),
-                last_modified=datetime.datetime.fromtimestamp(stat.st_mtime)
-            )
+        image = cls(
+            name=os.path.basename(path),
+            checksum_type=checksum_type,
+            size=stat.st_size,
+            location='file://{}'.format(os.path.abspath(path)),
+            last_modified=datetime.datetime.fromtimestamp(stat.st_mtime)
+        )
+        image._path = path
+        return image
+
+    def _hash_file(self):
+        hasher = getattr(hashlib, self._checksum_type)()
+        with open(self._path, 'rb') as f:
             while True:
                 buf = f.read(DEFAULT_CHUNK_SIZE)
                 if not buf: break
                 hasher.update(buf)
-            image.checksum = hasher.hexdigest()
-        return image
+        return hasher.hexdigest()
 
     @property
     def checksum(self):
+        if self._checksum is None and self._path is not None:
+            self.checksum = self._hash_file()
         return self._checksum
 
     @checksum.setter
     def checksum(self, value):
         self._checksum = value.lower()
 
+    @property
+    def checksum_known(self):
+        # False while a local file has not been hashed yet
+        return self._checksum is not None
+
     @property
     def checksum_type(self):
         if self._checksum_type is None:
@@ -71,7 +87,7 @@ class Image(object):
     def __repr__(self):
         return '<Image name={} checksum={} checksum_type={} location={} last_modified="{}" size={}>'.format(
             self.name,
-            self.checksum,
+            self._checksum,
             self.checksum_type,
             self.location,
             self.last_modified,
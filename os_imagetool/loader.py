@@ -2,10 +2,8 @@ from __future__ import print_function, unicode_literals
 
 from urlparse import urlparse
 
-import requests
-import functools
-
 from os_imagetool.errors import ImageToolError
+from os_imagetool.scheduler import get_scheduler
 
 DEFAULT_CHUNK_SIZE = 1024 * 1024
 
@@ -22,31 +20,40 @@ class Reader(object):
     def bufread(self, file, chunk_size=DEFAULT_CHUNK_SIZE):
         while True:
             chunk = file.read(chunk_size)
-            if chunk is None:
-                raise StopIteration
+            # Files return an empty string at EOF
+            if not chunk:
+                return
             if callable(self.callback):
                 self.callback(chunk)
             yield chunk
 
 class Downloader(Reader):
-    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, *args, **kwargs):
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, scheduler=None,
+                 session=None, throttle_global=True, *args, **kwargs):
         super(Downloader, self).__init__(*args, **kwargs)
         self.chunk_size = chunk_size
+        self.scheduler = scheduler
+        self.throttle_global = throttle_global
+        self.session = session
 
     def iter_download(self, url):
         parsed = urlparse(url)
         if parsed.scheme == 'file':
             stream = open(parsed.path, mode='rb')
+            for chunk in self.bufread(stream, chunk_size=self.chunk_size):
+                yield chunk
         elif parsed.scheme == 'http' or parsed.scheme == 'https':
-            res = requests.get(url, stream=True)
-            if not res.ok:
-                raise ImageToolError("non-ok response: {}".format(res))
-            stream = res.iter_content(
-                chunk_size=self.chunk_size)
-        if hasattr(stream, 'read'):
-            method = functools.partial(self.bufread, chunk_size=self.chunk_size)
+            from os_imagetool.transport import get_session, http_errors
+            with http_errors():
+                res = (self.session or get_session()).get(url, stream=True)
+                if not res.ok:
+                    raise ImageToolError("non-ok response: {}".format(res))
+                stream = res.iter_content(
+                    chunk_size=self.chunk_size)
+                scheduler = self.scheduler or get_scheduler()
+                stream = scheduler.iter_throttle(
+                    url, stream, throttle_global=self.throttle_global)
+                for chunk in self.iter_read(stream):
+                    yield chunk
         else:
-            method = self.iter_read
-
-        for chunk in method(stream):
-            yield chunk
+            raise ImageToolError('unsupported location {}'.format(url))
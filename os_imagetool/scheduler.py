@@ -0,0 +1,84 @@
+from __future__ import print_function, unicode_literals
+
+import logging
+import threading
+import time
+from urlparse import urlparse
+
+LOG = logging.getLogger(__name__)
+
+
+# Blocking token bucket limiting throughput to rate bytes per second.
+# Consumers may take more tokens than are available, the bucket then goes
+# into debt and the caller sleeps until the debt would have been repaid.
+class TokenBucket(object):
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else rate)
+        self.tokens = self.capacity
+        self.timestamp = time.time()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.time()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.timestamp) * self.rate)
+        self.timestamp = now
+
+    def consume(self, amount):
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# Process wide transfer scheduler limiting the byte rate globally and per
+# remote host
+class TransferScheduler(object):
+    def __init__(self, max_rate=None, max_host_rate=None):
+        self.max_rate = max_rate
+        self.max_host_rate = max_host_rate
+        self.global_bucket = TokenBucket(max_rate) if max_rate else None
+        self.host_buckets = {}
+        self.lock = threading.Lock()
+
+    def _host_bucket(self, host):
+        with self.lock:
+            bucket = self.host_buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.max_host_rate)
+                self.host_buckets[host] = bucket
+            return bucket
+
+    # Bytes relayed from one host to another pass through two throttled
+    # streams; only one of them may charge the global bucket
+    def throttle(self, url, amount, throttle_global=True):
+        if self.max_host_rate:
+            host = urlparse(url).netloc
+            if host:
+                self._host_bucket(host).consume(amount)
+        if throttle_global and self.global_bucket is not None:
+            self.global_bucket.consume(amount)
+
+    def iter_throttle(self, url, stream, throttle_global=True):
+        for chunk in stream:
+            if chunk:
+                self.throttle(url, len(chunk), throttle_global=throttle_global)
+            yield chunk
+
+
+_scheduler = TransferScheduler()
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def configure(max_rate=None, max_host_rate=None):
+    global _scheduler
+    _scheduler = TransferScheduler(
+        max_rate=max_rate, max_host_rate=max_host_rate)
+    return _scheduler
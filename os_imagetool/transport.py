@@ -0,0 +1,78 @@
+from __future__ import print_function, unicode_literals
+
+import contextlib
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+from os_imagetool.errors import ImageToolError
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (10, 60)
+
+
+class HTTPSession(requests.Session):
+    def __init__(self,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF,
+                 timeout=DEFAULT_TIMEOUT):
+        super(HTTPSession, self).__init__()
+        self.timeout = timeout
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(500, 502, 503, 504),
+            # Hand the last response back so callers can check res.ok
+            raise_on_status=False)
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super(HTTPSession, self).request(method, url, **kwargs)
+
+
+@contextlib.contextmanager
+def http_errors():
+    try:
+        yield
+    except requests.RequestException as e:
+        raise ImageToolError('http request failed: {}'.format(e))
+
+
+_session = None
+_session_kwargs = {}
+_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            _session = HTTPSession(**_session_kwargs)
+        return _session
+
+
+def configure(**kwargs):
+    global _session, _session_kwargs
+    with _lock:
+        _session_kwargs = dict((k, v) for k, v in kwargs.items()
+                               if v is not None)
+        if _session is not None:
+            _session.close()
+        _session = None